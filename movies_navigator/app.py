@@ -1,13 +1,18 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import argparse
+import heapq
+import shlex
 import warnings
 from movies_navigator.utils import *
+from movies_navigator.similar import update_neighbour_table, get_similar_movies, neighbours_file
+from movies_navigator.query import Statistics, Plan, Predicate, parse_query, conjunction
 from movies_navigator import __version__
 from cmd import Cmd
 
 warnings.simplefilter('ignore', UserWarning)
 from fuzzywuzzy import fuzz
+from movies_navigator.duplicates import find_duplicates
 
 __author__ = "Ali Masri"
 __copyright__ = "Ali Masri"
@@ -46,21 +51,36 @@ def parse_args(args):
     return parser.parse_args(args)
 
 
+def non_negative_int(value):
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError("must be a non-negative integer: " + value)
+    return number
+
+
 def parse_ls(args):
     parser = argparse.ArgumentParser("ls")
     parser.add_argument("-t", "--type", dest="type", help="movie type", choices=[TYPE_SEEN, TYPE_WATCHLIST],
                         type=str)
     parser.add_argument("--min-rating", dest="min_rating", help="the minimum rating of the movie", choices=range(0, 11),
-                        default=0, type=int)
-    parser.add_argument("--max-rating", dest="max_rating", help="the maximum rating of the movie", choices=range(0, 11),
-                        default=10, type=int)
-    parser.add_argument("-g", "--genres", dest="genres", help="the movie genres", nargs="*")
-    parser.add_argument("--min-year", dest="min_year", help="the minimum release year of the movie", default=0,
                         type=int)
-    parser.add_argument("--max-year", dest="max_year", help="the maximum release year of the movie", default=9999,
+    parser.add_argument("--max-rating", dest="max_rating", help="the maximum rating of the movie", choices=range(0, 11),
                         type=int)
+    parser.add_argument("-g", "--genres", dest="genres", help="the movie genres", nargs="*")
+    parser.add_argument("--min-year", dest="min_year", help="the minimum release year of the movie", type=int)
+    parser.add_argument("--max-year", dest="max_year", help="the maximum release year of the movie", type=int)
     parser.add_argument("--sort-by", dest="sort_by", help="choose the order of the movies",
-                        choices=["year", "rating", "title", "id", ""], type=str)
+                        choices=["year", "rating", "title", "id", "size", ""], type=str)
+    parser.add_argument("--min-size", dest="min_size", help="the minimum folder size of the movie (e.g. 700M, 4G)",
+                        type=parse_size)
+    parser.add_argument("--max-size", dest="max_size", help="the maximum folder size of the movie (e.g. 700M, 4G)",
+                        type=parse_size)
+    parser.add_argument("-q", "--query", dest="query",
+                        help="a query combining field predicates (type, genre, year, rating, size, title, plot) "
+                             "with AND, OR, NOT and parentheses, e.g. "
+                             "'genre:comedy AND (year>=2000 OR rating>8) AND NOT type:seen'", type=str)
+    parser.add_argument("--limit", dest="limit", help="the maximum number of movies to list",
+                        type=non_negative_int)
     return parser.parse_args(args)
 
 
@@ -73,25 +93,6 @@ class Filter:
                 results.append(movie)
         return results
 
-    @staticmethod
-    def by_rating(movies, min_rating=0, max_rating=10):
-        return list(
-            filter(lambda movie: min_rating <= float(movie.rating) <= max_rating, movies))
-
-    @staticmethod
-    def by_type(movies, _type):
-        return list(filter(lambda movie: movie.type == _type, movies))
-
-    @staticmethod
-    def by_genre(movies, genres):
-        if genres is None:
-            return movies
-        return list(filter(lambda movie: set(genres).issubset(set(movie.genres)), movies))
-
-    @staticmethod
-    def by_year(movies, min_year=0, max_year=9999):
-        return list(filter(lambda movie: min_year <= movie.year <= max_year, movies))
-
 
 class Cli(Cmd):
     def __init__(self, all_movies, seen_path, watchlist_path, data_file):
@@ -100,37 +101,55 @@ class Cli(Cmd):
         self.seen_path = seen_path
         self.watchlist_path = watchlist_path
         self.data_file = data_file
+        self.neighbours = load_object(neighbours_file(data_file))
+        self.refresh_neighbours()
+        self.refresh_statistics()
+
+    def refresh_statistics(self):
+        self.statistics = Statistics(self.all_movies)
+
+    def refresh_neighbours(self):
+        self.neighbours, updated = update_neighbour_table(self.all_movies, self.neighbours)
+        if updated:
+            persist_object(neighbours_file(self.data_file), self.neighbours)
 
     def do_search(self, movie_title):
         """search movie_title
         Searches a movie by title using fuzzy string matching"""
         print_movies(Filter.by_title(self.all_movies, movie_title))
 
+    def query_movies(self, line):
+        args = parse_ls(shlex.split(line or ""))
+        nodes = [parse_query(args.query or "")]
+        if args.type is not None:
+            nodes.append(Predicate("type", "=", args.type))
+        if args.min_year is not None:
+            nodes.append(Predicate("year", ">=", str(args.min_year)))
+        if args.max_year is not None:
+            nodes.append(Predicate("year", "<=", str(args.max_year)))
+        if args.min_rating is not None:
+            nodes.append(Predicate("rating", ">=", str(args.min_rating)))
+        if args.max_rating is not None:
+            nodes.append(Predicate("rating", "<=", str(args.max_rating)))
+        for genre in args.genres or []:
+            nodes.append(Predicate("genre", "=", genre.lower()))
+        if args.min_size is not None:
+            nodes.append(Predicate("size", ">=", str(args.min_size)))
+        if args.max_size is not None:
+            nodes.append(Predicate("size", "<=", str(args.max_size)))
+        plan = Plan(conjunction(nodes), self.statistics)
+        if args.sort_by and args.limit is not None:
+            movies = heapq.nsmallest(args.limit, plan.execute(self.all_movies),
+                                     key=lambda movie: getattr(movie, args.sort_by))
+        elif args.sort_by:
+            movies = sorted(plan.execute(self.all_movies), key=lambda movie: getattr(movie, args.sort_by))
+        else:
+            movies = list(plan.execute(self.all_movies, args.limit))
+        return plan, movies
+
     def do_ls(self, line):
-        if line is not None and line != "":
-            line = line.strip()
-            line = line.split(" ")
         try:
-            args = parse_ls(line)
-            _type = args.type or None
-            min_rating = args.min_rating
-            max_rating = args.max_rating
-            min_year = args.min_year
-            max_year = args.max_year
-            genres = args.genres
-            sort_by = args.sort_by
-            if _type is None:
-                movies = self.all_movies
-            else:
-                movies = Filter.by_type(self.all_movies, _type)
-            if min_year is not None or max_year is not None:
-                movies = Filter.by_year(movies, min_year, max_year)
-            if min_rating is not None or max_rating is not None:
-                movies = Filter.by_rating(movies, min_rating, max_rating)
-            if genres is not None:
-                movies = Filter.by_genre(movies, genres)
-            if sort_by is not None:
-                movies = sorted(movies, key=lambda movie: getattr(movie, sort_by))
+            _, movies = self.query_movies(line)
             print_movies(movies)
         except Exception as e:
             print(e)
@@ -140,6 +159,18 @@ class Cli(Cmd):
     def help_ls(self):
         print('run ls -h for detailed information')
 
+    def do_explain(self, line):
+        """explain [ls arguments]
+        Shows the filter plan chosen for an ls command and the rows flowing through each stage"""
+        try:
+            plan, movies = self.query_movies(line)
+            print(plan.explain())
+            print("{} movies returned".format(len(movies)))
+        except Exception as e:
+            print(e)
+        except SystemExit:
+            pass
+
     def do_open(self, movie_id):
         """open movie_id
         Opens the movie directory with the folder manager"""
@@ -162,6 +193,28 @@ class Cli(Cmd):
             if movie is not None:
                 print(get_movie_information(movie))
 
+    def do_similar(self, movie_id):
+        """similar movie_id
+        Lists the movies most similar to the given one by genres, decade and plot"""
+        if movie_id is not None and movie_id.isdigit():
+            movie_id = int(movie_id)
+            movie = get_movie_by_id(self.all_movies, movie_id)
+            if movie is not None:
+                print_movies(get_similar_movies(self.all_movies, self.neighbours, movie))
+            else:
+                print("No movie found!")
+
+    def do_dupes(self, line):
+        """dupes
+        Lists groups of movies that look like copies of the same film"""
+        groups, nb_checked, nb_skipped = find_duplicates(self.all_movies)
+        for group in groups:
+            print_movies(group)
+            for movie in group:
+                print("    {} ({})".format(movie.path, print_size(movie.size)))
+        print("{} duplicate groups found, {} candidate pairs checked, {} oversized buckets skipped".format(
+            len(groups), nb_checked, nb_skipped))
+
     def do_mv(self, movie_id):
         """mv movie_id
         Toggles the movie folder from seen to watchlist and vice-versa"""
@@ -174,6 +227,8 @@ class Cli(Cmd):
             try:
                 move_movie(movie, self.seen_path, self.watchlist_path)
                 persist_object(self.data_file, self.all_movies)
+                self.refresh_neighbours()
+                self.refresh_statistics()
             except Exception as e:
                 print("error!\n" + str(e))
         else:
@@ -183,8 +238,12 @@ class Cli(Cmd):
         """reload
         Reloads the movie list from the directories"""
         try:
-            self.all_movies = load_movies(self.seen_path, self.watchlist_path)
+            size_cache = load_object(sizes_file(self.data_file)) or {}
+            self.all_movies = load_movies(self.seen_path, self.watchlist_path, size_cache)
             persist_object(self.data_file, self.all_movies)
+            persist_object(sizes_file(self.data_file), size_cache)
+            self.refresh_neighbours()
+            self.refresh_statistics()
         except FileNotFoundError:
             print("Error - Please make sure that the directories you specified actually exist")
 
@@ -193,9 +252,13 @@ class Cli(Cmd):
         Returns a summary of the current movie database
         """
         nb_total = len(self.all_movies)
-        nb_seen = len(list(filter(lambda movie: movie.type == TYPE_SEEN, self.all_movies)))
-        nb_watchlist = len(list(filter(lambda movie: movie.type == TYPE_WATCHLIST, self.all_movies)))
-        print("Total number of movies {}\nSeen: {}, Watchlist: {}".format(nb_total, nb_seen, nb_watchlist))
+        seen = list(filter(lambda movie: movie.type == TYPE_SEEN, self.all_movies))
+        watchlist = list(filter(lambda movie: movie.type == TYPE_WATCHLIST, self.all_movies))
+        seen_size = sum(movie.size for movie in seen)
+        watchlist_size = sum(movie.size for movie in watchlist)
+        print("Total number of movies {}\nSeen: {} ({} bytes, {}), Watchlist: {} ({} bytes, {})".format(
+            nb_total, len(seen), seen_size, print_size(seen_size), len(watchlist), watchlist_size,
+            print_size(watchlist_size)))
 
     def do_cls(self, line):
         """cls
@@ -219,14 +282,18 @@ def main(args):
     print("Loading movies...")
     all_movies = load_object(data_file)
     if all_movies is None:
+        size_cache = load_object(sizes_file(data_file)) or {}
         try:
-            all_movies = load_movies(seen_path, watch_list_path)
+            all_movies = load_movies(seen_path, watch_list_path, size_cache)
         except FileNotFoundError:
             print("Error - Please make sure that the directories you specified actually exist")
             return
         persist_object(data_file, all_movies)
+        persist_object(sizes_file(data_file), size_cache)
         print("Movies loaded successfully")
     else:
+        # data files written by older versions may hold None for watchlist folders without an info file
+        all_movies = [movie for movie in all_movies if movie is not None]
         print("Movies loaded from previous data - use 'reload' command to refresh")
     print('Total number of movies: {0}'.format(len(all_movies)))
     cli = Cli(all_movies, seen_path, watch_list_path, data_file)
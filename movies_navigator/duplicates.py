@@ -0,0 +1,97 @@
+import re
+import zlib
+from collections import defaultdict
+from itertools import combinations
+
+from fuzzywuzzy import fuzz
+
+DUPLICATE_RATIO = 90
+NGRAM_SIZE = 3
+MINHASH_BANDS = 8
+MINHASH_ROWS = 3
+MAX_BUCKET_SIZE = 200
+MINHASH_MASKS = [zlib.crc32("minhash {}".format(i).encode("utf-8")) for i in range(MINHASH_BANDS * MINHASH_ROWS)]
+
+
+def normalize_title(title):
+    return " ".join(re.findall(r"[a-z0-9]+", title.lower()))
+
+
+def title_ngrams(title):
+    padded = " {} ".format(title)
+    return {padded[i:i + NGRAM_SIZE] for i in range(max(1, len(padded) - NGRAM_SIZE + 1))}
+
+
+def minhash_signature(ngrams):
+    hashes = [zlib.crc32(ngram.encode("utf-8")) for ngram in ngrams]
+    return [min(map(mask.__xor__, hashes)) for mask in MINHASH_MASKS]
+
+
+def band_keys(year, title):
+    """Yields the minhash bands of the title n-grams, scoped to the release year"""
+    signature = minhash_signature(title_ngrams(title))
+    for band in range(MINHASH_BANDS):
+        yield (year, band) + tuple(signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS])
+
+
+def deletion_keys(year, title):
+    """Yields the title and every variant with one character deleted, scoped to the release year
+
+    Two titles one insertion, deletion or substitution apart always share one of these keys."""
+    yield year, "deletion", title
+    for index in range(len(title)):
+        yield year, "deletion", title[:index] + title[index + 1:]
+
+
+def candidate_pairs(movies):
+    """Returns the index pairs sharing a minhash band or a deletion variant, the number of buckets skipped because
+    they were larger than MAX_BUCKET_SIZE, and the groups of movies with the same year and normalized title
+
+    Only the first movie of each exact title group enters the buckets."""
+    title_groups = defaultdict(list)
+    for index, movie in enumerate(movies):
+        title_groups[movie.year, normalize_title(movie.title)].append(index)
+    buckets = defaultdict(list)
+    for (year, title), indexes in title_groups.items():
+        for key in set(band_keys(year, title)) | set(deletion_keys(year, title)):
+            buckets[key].append(indexes[0])
+    pairs = set()
+    nb_skipped = 0
+    for bucket in buckets.values():
+        if len(bucket) < 2:
+            continue
+        if len(bucket) > MAX_BUCKET_SIZE:
+            nb_skipped += 1
+            continue
+        pairs.update(combinations(bucket, 2))
+    return pairs, nb_skipped, list(title_groups.values())
+
+
+def find_duplicates(movies, ratio=DUPLICATE_RATIO):
+    """Groups movies that look like copies of the same film
+
+    Movies with the same year and normalized title are always grouped, other candidate pairs are verified with
+    fuzz.ratio. Returns the list of groups, the number of verified pairs and the number of skipped buckets."""
+    pairs, nb_skipped, title_groups = candidate_pairs(movies)
+    parents = list(range(len(movies)))
+
+    def find(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    for indexes in title_groups:
+        for index in indexes[1:]:
+            parents[find(index)] = find(indexes[0])
+    nb_checked = 0
+    for first, second in pairs:
+        if find(first) == find(second):
+            continue
+        nb_checked += 1
+        if fuzz.ratio(movies[first].title, movies[second].title) >= ratio:
+            parents[find(first)] = find(second)
+    groups = defaultdict(list)
+    for index, movie in enumerate(movies):
+        groups[find(index)].append(movie)
+    return [group for group in groups.values() if len(group) > 1], nb_checked, nb_skipped
@@ -15,6 +15,11 @@ class Movie:
         self.id = 0
         self.type = ""
         self.path = ""
+        self.size = 0
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.__dict__.update(state)
 
     def __repr__(self):
         return '[{0}] {1} - {2}, rating {3}, genres: {4}'.format(self.id, self.title, self.year, self.rating,
@@ -0,0 +1,330 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from itertools import islice
+
+from movies_navigator.movie import TYPE_SEEN, TYPE_WATCHLIST
+from movies_navigator.utils import parse_size
+
+FIELD_COSTS = {"type": 1, "year": 1, "rating": 1, "size": 1, "genre": 2, "title": 3, "plot": 5}
+NUMERIC_FIELDS = {"year": int, "rating": float, "size": parse_size}
+TEXT_OPERATORS = {":", "="}
+SET_OPERATORS = {":", "=", "!="}
+
+TOKEN_PATTERN = re.compile(r'\s*(?:(?P<paren>[()])|'
+                           r'(?P<field>[a-z]+)\s*(?P<operator><=|>=|!=|:|=|<|>)\s*(?P<value>"[^"]*"|[^\s()"]+)|'
+                           r'(?P<keyword>[a-z]+))', re.IGNORECASE)
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class Statistics:
+    """Value distributions of the movie list used to estimate the selectivity of predicates"""
+
+    def __init__(self, movies):
+        self.nb_movies = len(movies)
+        self.type_counts = defaultdict(int)
+        self.genre_counts = defaultdict(int)
+        self.plot_counts = defaultdict(int)
+        self.title_counts = defaultdict(int)
+        for movie in movies:
+            self.type_counts[movie.type] += 1
+            for genre in set(movie.genres):
+                self.genre_counts[genre] += 1
+            for word in set(WORD_PATTERN.findall(movie.plot)):
+                self.plot_counts[word] += 1
+            for word in set(WORD_PATTERN.findall(movie.title)):
+                self.title_counts[word] += 1
+        self.values = {field: sorted(getattr(movie, field) for movie in movies) for field in NUMERIC_FIELDS}
+
+    def words_fraction(self, counts, text):
+        """Estimates the fraction of movies containing all words of text by its rarest word"""
+        return self.fraction(min(counts.get(word, 0) for word in WORD_PATTERN.findall(text)))
+
+    def fraction(self, count):
+        return count / self.nb_movies if self.nb_movies else 1.0
+
+    def range_fraction(self, field, operator, value):
+        values = self.values[field]
+        if operator == "<":
+            count = bisect_left(values, value)
+        elif operator == "<=":
+            count = bisect_right(values, value)
+        elif operator == ">":
+            count = len(values) - bisect_right(values, value)
+        elif operator == ">=":
+            count = len(values) - bisect_left(values, value)
+        else:
+            count = bisect_right(values, value) - bisect_left(values, value)
+            if operator == "!=":
+                count = len(values) - count
+        return self.fraction(count)
+
+
+class Predicate:
+    def __init__(self, field, operator, value):
+        if field not in FIELD_COSTS:
+            raise ValueError("unknown field: " + field)
+        if not WORD_PATTERN.search(str(value)):
+            raise ValueError("empty {} value".format(field))
+        if field in NUMERIC_FIELDS:
+            try:
+                value = NUMERIC_FIELDS[field](value)
+            except ValueError:
+                raise ValueError("invalid {} value: {}".format(field, value))
+        elif field in ("type", "genre"):
+            if operator not in SET_OPERATORS:
+                raise ValueError("{} only supports :, = and !=".format(field))
+            if field == "type" and value not in (TYPE_SEEN, TYPE_WATCHLIST):
+                raise ValueError("invalid type: " + value)
+        elif operator not in TEXT_OPERATORS:
+            raise ValueError("{} only supports : and =".format(field))
+        self.field = field
+        self.operator = "=" if operator == ":" else operator
+        self.value = value
+        self.cost = FIELD_COSTS[field]
+
+    def selectivity(self, statistics):
+        if self.field in NUMERIC_FIELDS:
+            return statistics.range_fraction(self.field, self.operator, self.value)
+        if self.field == "title":
+            return statistics.words_fraction(statistics.title_counts, self.value)
+        if self.field == "plot":
+            return statistics.words_fraction(statistics.plot_counts, self.value)
+        counts = statistics.type_counts if self.field == "type" else statistics.genre_counts
+        fraction = statistics.fraction(counts.get(self.value, 0))
+        return 1 - fraction if self.operator == "!=" else fraction
+
+    def compile(self, statistics):
+        field, operator, value = self.field, self.operator, self.value
+        if field in NUMERIC_FIELDS:
+            return {
+                "=": lambda movie: getattr(movie, field) == value,
+                "!=": lambda movie: getattr(movie, field) != value,
+                "<": lambda movie: getattr(movie, field) < value,
+                "<=": lambda movie: getattr(movie, field) <= value,
+                ">": lambda movie: getattr(movie, field) > value,
+                ">=": lambda movie: getattr(movie, field) >= value,
+            }[operator]
+        if field in ("title", "plot"):
+            pattern = re.compile(r"\b{}\b".format(re.escape(value)))
+            return lambda movie: pattern.search(getattr(movie, field)) is not None
+        if field == "type":
+            test = lambda movie: movie.type == value
+        else:
+            test = lambda movie: value in movie.genres
+        return (lambda movie: not test(movie)) if operator == "!=" else test
+
+    def describe(self, statistics):
+        return "{}{}{}".format(self.field, self.operator, self.value)
+
+
+class And:
+    def __init__(self, children):
+        self.children = children
+        self.cost = sum(child.cost for child in children)
+
+    def selectivity(self, statistics):
+        result = 1.0
+        for child in self.children:
+            result *= child.selectivity(statistics)
+        return result
+
+    def ordered(self, statistics):
+        """Cheap predicates that reject most rows first so that rows are dropped as early as possible"""
+        return sorted(self.children, key=lambda child: rank(child.cost, 1 - child.selectivity(statistics)))
+
+    def compile(self, statistics):
+        tests = [child.compile(statistics) for child in self.ordered(statistics)]
+        return lambda movie: all(test(movie) for test in tests)
+
+    def describe(self, statistics):
+        return "(" + " AND ".join(child.describe(statistics) for child in self.ordered(statistics)) + ")"
+
+
+class Or:
+    def __init__(self, children):
+        self.children = children
+        self.cost = sum(child.cost for child in children)
+
+    def selectivity(self, statistics):
+        result = 1.0
+        for child in self.children:
+            result *= 1 - child.selectivity(statistics)
+        return 1 - result
+
+    def ordered(self, statistics):
+        """Cheap predicates that accept most rows first so that rows are accepted as early as possible"""
+        return sorted(self.children, key=lambda child: rank(child.cost, child.selectivity(statistics)))
+
+    def compile(self, statistics):
+        tests = [child.compile(statistics) for child in self.ordered(statistics)]
+        return lambda movie: any(test(movie) for test in tests)
+
+    def describe(self, statistics):
+        return "(" + " OR ".join(child.describe(statistics) for child in self.ordered(statistics)) + ")"
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+        self.cost = child.cost
+
+    def selectivity(self, statistics):
+        return 1 - self.child.selectivity(statistics)
+
+    def compile(self, statistics):
+        test = self.child.compile(statistics)
+        return lambda movie: not test(movie)
+
+    def describe(self, statistics):
+        return "NOT " + self.child.describe(statistics)
+
+
+def rank(cost, probability):
+    return cost / probability if probability > 0 else float("inf")
+
+
+def tokenize(query):
+    tokens = []
+    position = 0
+    query = query.strip()
+    while position < len(query):
+        match = TOKEN_PATTERN.match(query, position)
+        if match is None:
+            raise ValueError("invalid query near: " + query[position:].strip())
+        if match.group("paren"):
+            tokens.append(match.group("paren"))
+        elif match.group("field"):
+            value = match.group("value").strip('"').lower()
+            tokens.append(Predicate(match.group("field").lower(), match.group("operator"), value))
+        else:
+            keyword = match.group("keyword").upper()
+            if keyword not in ("AND", "OR", "NOT"):
+                raise ValueError("unexpected word: " + match.group("keyword"))
+            tokens.append(keyword)
+        position = match.end()
+    return tokens
+
+
+class Parser:
+    """Recursive descent parser, NOT binds tighter than AND which binds tighter than OR.
+    Juxtaposed terms are joined with AND"""
+
+    def __init__(self, query):
+        self.tokens = tokenize(query)
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise ValueError("unexpected end of query")
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            return None
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError("unexpected token: {}".format(self.peek()))
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == "OR":
+            self.next()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self):
+        children = [self.parse_not()]
+        while self.peek() is not None and self.peek() not in ("OR", ")"):
+            if self.peek() == "AND":
+                self.next()
+            children.append(self.parse_not())
+        return children[0] if len(children) == 1 else And(children)
+
+    def parse_not(self):
+        if self.peek() == "NOT":
+            self.next()
+            return Not(self.parse_not())
+        token = self.next()
+        if token == "(":
+            node = self.parse_or()
+            if self.peek() != ")":
+                raise ValueError("missing closing parenthesis")
+            self.next()
+            return node
+        if isinstance(token, Predicate):
+            return token
+        raise ValueError("unexpected token: {}".format(token))
+
+
+def parse_query(query):
+    return Parser(query).parse()
+
+
+def conjunction(nodes):
+    """Flattens the given nodes into a single AND node, None nodes are ignored"""
+    children = []
+    for node in nodes:
+        if isinstance(node, And):
+            children.extend(node.children)
+        elif node is not None:
+            children.append(node)
+    if not children:
+        return None
+    return children[0] if len(children) == 1 else And(children)
+
+
+class Stage:
+    def __init__(self, node, statistics):
+        self.description = node.describe(statistics)
+        self.selectivity = node.selectivity(statistics)
+        self.cost = node.cost
+        self.test = node.compile(statistics)
+        self.rows_in = 0
+        self.rows_out = 0
+
+    def run(self, movies):
+        for movie in movies:
+            self.rows_in += 1
+            if self.test(movie):
+                self.rows_out += 1
+                yield movie
+
+
+class Plan:
+    """A pipeline of filter stages, one per top level AND term, ordered by estimated selectivity and cost"""
+
+    def __init__(self, node, statistics):
+        if node is None:
+            nodes = []
+        elif isinstance(node, And):
+            nodes = node.ordered(statistics)
+        else:
+            nodes = [node]
+        self.stages = [Stage(child, statistics) for child in nodes]
+        self.nb_movies = statistics.nb_movies
+
+    def execute(self, movies, limit=None):
+        """Lazily yields the matching movies, upstream stages stop being pulled once limit rows were produced"""
+        rows = iter(movies)
+        for stage in self.stages:
+            rows = stage.run(rows)
+        if limit is not None:
+            rows = islice(rows, limit)
+        return rows
+
+    def explain(self):
+        lines = []
+        for index, stage in enumerate(self.stages, 1):
+            lines.append("{}. {}\n   estimated selectivity {:.3f} ({:.0f} rows), cost {}, rows {} -> {}".format(
+                index, stage.description, stage.selectivity, stage.selectivity * self.nb_movies, stage.cost,
+                stage.rows_in, stage.rows_out))
+        if not lines:
+            lines.append("full scan of {} movies".format(self.nb_movies))
+        return "\n".join(lines)
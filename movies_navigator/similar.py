@@ -0,0 +1,184 @@
+import re
+import math
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+
+NEIGHBOURS_COUNT = 10
+GENRE_WEIGHT = 1.0
+DECADE_WEIGHT = 0.3
+PLOT_WEIGHT = 1.0
+POSTING_WINDOW = 50
+RARE_WORD_DOCUMENTS = 50
+MAX_CANDIDATES = 30
+REBUILD_DRIFT = 0.2
+
+STOP_WORDS = {"the", "and", "for", "with", "his", "her", "their", "they", "from", "into", "that", "this", "who",
+              "when", "while", "after", "before", "are", "was", "were", "has", "have", "had", "but", "not", "one",
+              "its", "him", "she", "them", "about", "over", "out", "all", "will", "can", "what", "which", "where",
+              "becomes", "must", "find", "finds", "only", "own", "new", "two"}
+
+
+def neighbours_file(data_file):
+    return data_file + ".neighbours"
+
+
+def movie_signature(movie):
+    return movie.year, tuple(movie.genres), movie.plot
+
+
+def tokenize_plot(plot):
+    return [word for word in re.findall(r"[a-z]+", plot.lower()) if len(word) > 2 and word not in STOP_WORDS]
+
+
+def candidate_keys(year, genres, plot, document_frequency):
+    """The index keys of a movie: its rare plot words and a bucket made of its genres and release decade
+
+    Rarity comes from the frozen document frequencies so that it does not depend on the other movies."""
+    keys = {"plot:" + word for word in tokenize_plot(plot)
+            if document_frequency.get(word, 0) <= RARE_WORD_DOCUMENTS}
+    keys.add("bucket:{}:{}".format(",".join(sorted(genres)), year // 10 * 10))
+    return keys
+
+
+def normalize(vector, weight=1.0):
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    if norm == 0:
+        return {}
+    return {term: weight * value / norm for term, value in vector.items()}
+
+
+def count_documents(movies):
+    document_frequency = defaultdict(int)
+    for movie in movies:
+        for word in set(tokenize_plot(movie.plot)):
+            document_frequency[word] += 1
+    return dict(document_frequency)
+
+
+def idf(word, document_frequency, nb_documents):
+    return math.log((1 + nb_documents) / (1 + document_frequency.get(word, 0))) + 1
+
+
+def build_feature_vectors(movies, document_frequency, nb_documents):
+    """Builds one sparse vector per movie path: genre one-hot, release decade and plot TF-IDF"""
+    vectors = {}
+    for movie in movies:
+        term_frequency = defaultdict(int)
+        for word in tokenize_plot(movie.plot):
+            term_frequency[word] += 1
+        plot_vector = {"plot:" + word: count * idf(word, document_frequency, nb_documents)
+                       for word, count in term_frequency.items()}
+        vector = normalize(plot_vector, PLOT_WEIGHT)
+        for genre in movie.genres:
+            vector["genre:" + genre] = GENRE_WEIGHT
+        if movie.year:
+            vector["decade:{}".format(movie.year // 10 * 10)] = DECADE_WEIGHT
+        vectors[movie.path] = normalize(vector)
+    return vectors
+
+
+def build_inverted_index(keys, signatures):
+    """Maps every key to its movies as (year, path) sorted by release year"""
+    index = defaultdict(list)
+    for path, movie_keys in keys.items():
+        for key in movie_keys:
+            index[key].append((signatures[path][0], path))
+    for postings in index.values():
+        postings.sort()
+    return index
+
+
+def posting_window(postings, position):
+    """The POSTING_WINDOW + 1 movies around position, shifted to stay inside the postings"""
+    start = min(max(0, position - POSTING_WINDOW // 2), max(0, len(postings) - POSTING_WINDOW - 1))
+    return postings[start:start + POSTING_WINDOW + 1]
+
+
+def similarity(vector, other_vector):
+    return sum(vector[term] * other_vector[term] for term in vector.keys() & other_vector.keys())
+
+
+def nearest_neighbours(path, year, vectors, keys, index, k):
+    """Scores a bounded candidate set: the movies of the genres and decade bucket plus the best rare plot word
+    matches. Long postings are capped to the movies closest in release year, so every key contributes candidates."""
+    vector = vectors[path]
+    plot_scores = defaultdict(float)
+    candidates = set()
+    for key in keys[path]:
+        postings = index[key]
+        window = posting_window(postings, bisect_left(postings, (year, path)))
+        if key.startswith("bucket:"):
+            candidates.update(other_path for _, other_path in window)
+            continue
+        value = vector.get(key, 0)
+        for _, other_path in window:
+            plot_scores[other_path] += value * vectors[other_path].get(key, 0)
+    plot_scores.pop(path, None)
+    candidates.update(other_path for other_path, _ in heapq.nlargest(MAX_CANDIDATES, plot_scores.items(),
+                                                                      key=lambda item: (item[1], item[0])))
+    candidates.discard(path)
+    scores = [(other_path, similarity(vector, vectors[other_path])) for other_path in candidates]
+    return heapq.nlargest(k, scores, key=lambda item: (item[1], item[0]))
+
+
+def new_neighbour_table(movies, k):
+    """An empty table whose plot document frequencies are frozen until the library size drifts too much"""
+    return {"k": k, "nb_documents": len(movies), "document_frequency": count_documents(movies),
+            "signatures": {}, "neighbours": {}}
+
+
+def affected_movies(changed, removed, signatures, old_signatures, keys, index, document_frequency):
+    """Movies whose rows may differ: the changed ones and, for every key of the old or new version of a changed or
+    removed movie, the movies whose posting window can contain that position"""
+    positions = defaultdict(list)
+    for path in changed | removed:
+        if path in signatures:
+            for key in keys[path]:
+                positions[key].append((signatures[path][0], path))
+        if path in old_signatures:
+            for key in candidate_keys(*old_signatures[path], document_frequency):
+                positions[key].append((old_signatures[path][0], path))
+    affected = set(changed)
+    for key, items in positions.items():
+        postings = index.get(key, [])
+        radius = POSTING_WINDOW + 1 + len(items)
+        for item in items:
+            position = bisect_left(postings, item)
+            affected.update(path for _, path in postings[max(0, position - radius):position + radius + 1])
+    return affected
+
+
+def update_neighbour_table(movies, table=None, k=NEIGHBOURS_COUNT):
+    """Brings the top-k neighbour table up to date with the given movies
+
+    Only rows of movies that share an index key with an added, changed or removed movie are recomputed, which
+    gives the same rows as a full build with the same frozen document frequencies.
+    Returns the table and whether anything changed."""
+    if table is None or table.get("k") != k or "document_frequency" not in table or \
+            abs(len(movies) - table["nb_documents"]) > REBUILD_DRIFT * max(table["nb_documents"], 1):
+        table = new_neighbour_table(movies, k)
+    signatures = {movie.path: movie_signature(movie) for movie in movies}
+    old_signatures = table["signatures"]
+    changed = {path for path, signature in signatures.items() if old_signatures.get(path) != signature}
+    removed = set(old_signatures) - set(signatures)
+    if not changed and not removed:
+        return table, False
+    vectors = build_feature_vectors(movies, table["document_frequency"], table["nb_documents"])
+    keys = {path: candidate_keys(*signature, table["document_frequency"]) for path, signature in signatures.items()}
+    index = build_inverted_index(keys, signatures)
+    affected = affected_movies(changed, removed, signatures, old_signatures, keys, index, table["document_frequency"])
+    neighbours = {}
+    for path in signatures:
+        if path in affected:
+            neighbours[path] = nearest_neighbours(path, signatures[path][0], vectors, keys, index, k)
+        else:
+            neighbours[path] = table["neighbours"][path]
+    table["signatures"] = signatures
+    table["neighbours"] = neighbours
+    return table, True
+
+
+def get_similar_movies(movies, table, movie):
+    movies_by_path = {m.path: m for m in movies}
+    return [movies_by_path[path] for path, _ in table["neighbours"].get(movie.path, []) if path in movies_by_path]
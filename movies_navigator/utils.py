@@ -4,6 +4,7 @@ import shutil
 import platform
 import subprocess
 import pickle
+from concurrent.futures import ThreadPoolExecutor
 
 from movies_navigator.movie import Movie, TYPE_SEEN, TYPE_WATCHLIST
 
@@ -12,6 +13,8 @@ from colorama import init, Fore
 init(autoreset=True)
 
 INFO_FILE = "info.txt"
+SIZE_WORKERS = 8
+SIZE_UNITS = {"": 1, "B": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
 
 if sys.version[0] == "3":
     raw_input = input
@@ -24,9 +27,10 @@ def get_movie_information(movie):
             'Rating: {3}\n'
             'Runtime: {4}\n'
             'Genres: {5}\n'
-            'Plot summary: {6}'.format(movie.title, movie.year, movie.release_date, movie.rating,
+            'Size: {6}\n'
+            'Plot summary: {7}'.format(movie.title, movie.year, movie.release_date, movie.rating,
                                        print_time(movie.runtime), movie.genres,
-                                       movie.plot))
+                                       print_size(movie.size), movie.plot))
 
 
 def load_movie(movie_path, movie_id, movie_type):
@@ -41,7 +45,7 @@ def load_movie(movie_path, movie_id, movie_type):
     return movie
 
 
-def load_movies(seen_path, watchlist_path):
+def load_movies(seen_path, watchlist_path, size_cache=None):
     movies = []
     movie_id = 1
     if (seen_path is not None and not os.path.isdir(seen_path)) \
@@ -60,8 +64,13 @@ def load_movies(seen_path, watchlist_path):
         for movie_folder in os.listdir(watchlist_path):
             movie_path = os.path.join(watchlist_path, movie_folder)
             movie = load_movie(movie_path, movie_id, TYPE_WATCHLIST)
+            if movie is None:
+                continue
             movie_id += 1
             movies.append(movie)
+    sizes = get_folder_sizes([movie.path for movie in movies], size_cache)
+    for movie, size in zip(movies, sizes):
+        movie.size = size
     return movies
 
 
@@ -74,6 +83,81 @@ def print_time(seconds):
         return seconds
 
 
+def print_size(size):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return "%.1f %s" % (size, unit)
+        size /= 1024.0
+    return "%.1f TB" % size
+
+
+def parse_size(value):
+    value = value.strip().upper().rstrip("B")
+    unit = value[-1:] if value[-1:] in SIZE_UNITS else ""
+    try:
+        size = int(float(value[:len(value) - len(unit)]) * SIZE_UNITS[unit])
+    except (ValueError, OverflowError):
+        raise ValueError("invalid size: " + value)
+    if size < 0:
+        raise ValueError("invalid size: " + value)
+    return size
+
+
+def sizes_file(data_file):
+    return data_file + ".sizes"
+
+
+def get_folder_size(path, cache=None, updated_cache=None):
+    """Returns the total size in bytes of the files under path
+
+    cache maps every folder to (mtime, files, sub folders); folders whose mtime did not change are not listed again
+    but their files are still stat-ed, since writing to a file does not change the mtime of its folder.
+    The entries of the visited folders are stored in updated_cache."""
+    cache = cache or {}
+    updated_cache = updated_cache if updated_cache is not None else {}
+    size = 0
+    folders = [path]
+    while folders:
+        folder = folders.pop()
+        try:
+            mtime = os.stat(folder).st_mtime
+        except OSError:
+            continue
+        entry = cache.get(folder)
+        if entry is None or entry[0] != mtime:
+            files = []
+            sub_folders = []
+            try:
+                with os.scandir(folder) as dir_entries:
+                    for dir_entry in dir_entries:
+                        if dir_entry.is_dir(follow_symlinks=False):
+                            sub_folders.append(dir_entry.path)
+                        elif dir_entry.is_file(follow_symlinks=False):
+                            files.append(dir_entry.path)
+            except OSError:
+                pass
+            entry = (mtime, files, sub_folders)
+        updated_cache[folder] = entry
+        for file_path in entry[1]:
+            try:
+                size += os.stat(file_path, follow_symlinks=False).st_size
+            except OSError:
+                pass
+        folders.extend(entry[2])
+    return size
+
+
+def get_folder_sizes(paths, cache=None):
+    """Computes the size of every path in parallel, cache is updated in place to only hold the visited folders"""
+    updated_cache = {}
+    with ThreadPoolExecutor(max_workers=SIZE_WORKERS) as executor:
+        sizes = list(executor.map(lambda path: get_folder_size(path, cache, updated_cache), paths))
+    if cache is not None:
+        cache.clear()
+        cache.update(updated_cache)
+    return sizes
+
+
 def parse_info_file(info):
     try:
         f = open(info, 'r')
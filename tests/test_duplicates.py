@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+import string
+
+import pytest
+from fuzzywuzzy import fuzz
+
+from movies_navigator import duplicates
+from movies_navigator.duplicates import find_duplicates
+from movies_navigator.movie import Movie, TYPE_SEEN, TYPE_WATCHLIST
+
+__author__ = "Ali Masri"
+__copyright__ = "Ali Masri"
+__license__ = "none"
+
+
+def make_movie(title, year, path, _type=TYPE_SEEN):
+    movie = Movie()
+    movie.title = title
+    movie.year = year
+    movie.path = path
+    movie.type = _type
+    return movie
+
+
+def group_paths(groups):
+    return sorted(sorted(movie.path for movie in group) for group in groups)
+
+
+def test_near_duplicates_are_grouped_across_types():
+    movies = [make_movie("the shawshank redemption", 1994, "/seen/shawshank"),
+              make_movie("the shawshank redemptionn", 1994, "/watchlist/shawshank.1080p", TYPE_WATCHLIST),
+              make_movie("the godfather", 1972, "/seen/godfather"),
+              make_movie("the godfather", 1990, "/seen/godfather 3"),
+              make_movie("pulp fiction", 1994, "/seen/pulp fiction")]
+    groups, nb_checked, nb_skipped = find_duplicates(movies)
+    assert group_paths(groups) == [["/seen/shawshank", "/watchlist/shawshank.1080p"]]
+    assert nb_checked >= 1
+    assert nb_skipped == 0
+
+
+def test_dissimilar_titles_are_not_grouped():
+    movies = [make_movie("alien", 1979, "/seen/alien"), make_movie("alien 3", 1979, "/seen/alien 3"),
+              make_movie("heat", 1979, "/seen/heat")]
+    groups, _, _ = find_duplicates(movies)
+    assert groups == []
+
+
+def test_exact_titles_are_grouped_even_in_oversized_buckets(monkeypatch):
+    monkeypatch.setattr(duplicates, "MAX_BUCKET_SIZE", 2)
+    movies = [make_movie("Heat", 1995, "/seen/heat {}".format(index)) for index in range(5)]
+    movies += [make_movie("heat!", 1995, "/watchlist/heat", TYPE_WATCHLIST)]
+    groups, nb_checked, nb_skipped = find_duplicates(movies)
+    assert len(groups) == 1 and len(groups[0]) == 6
+    assert nb_checked == 0
+    assert nb_skipped == 0
+
+
+def test_oversized_buckets_are_reported(monkeypatch):
+    monkeypatch.setattr(duplicates, "MAX_BUCKET_SIZE", 2)
+    movies = [make_movie("heat {}".format(index), 1995, "/seen/{}".format(index)) for index in range(3)]
+    movies.append(make_movie("heat 1", 1996, "/seen/other year"))
+    _, _, nb_skipped = find_duplicates(movies)
+    # each oversized bucket is counted once: the shared "heat " deletion variant and at most every minhash band
+    assert 1 <= nb_skipped <= duplicates.MINHASH_BANDS + 1
+
+
+def single_edit(title, rand):
+    position = rand.randrange(len(title))
+    letter = rand.choice(string.ascii_lowercase)
+    edit = rand.choice(["insert", "delete", "substitute"])
+    if edit == "insert":
+        return title[:position] + letter + title[position:]
+    if edit == "delete":
+        return title[:position] + title[position + 1:]
+    return title[:position] + letter + title[position + 1:]
+
+
+@pytest.mark.parametrize("first, second", [
+    ("abbydst hil", "abbybdst hil"),
+    ("doz gzyl", "doz zyl"),
+    ("heat", "heath"),
+    ("up", "ups"),
+])
+def test_short_titles_one_edit_apart_are_grouped(first, second):
+    movies = [make_movie(first, 2001, "/seen/a"), make_movie(second, 2001, "/watchlist/b", TYPE_WATCHLIST)]
+    groups, _, _ = find_duplicates(movies, ratio=fuzz.ratio(first, second))
+    assert group_paths(groups) == [["/seen/a", "/watchlist/b"]]
+
+
+def test_single_typo_recall():
+    rand = random.Random(7)
+    pairs = []
+    while len(pairs) < 500:
+        words = ["".join(rand.choice(string.ascii_lowercase) for _ in range(rand.randint(2, 8)))
+                 for _ in range(rand.randint(1, 3))]
+        title = " ".join(words)
+        typo = single_edit(title, rand)
+        if typo.strip() == typo and "  " not in typo and fuzz.ratio(title, typo) >= duplicates.DUPLICATE_RATIO:
+            pairs.append((title, typo))
+    movies = []
+    for index, (title, typo) in enumerate(pairs):
+        movies.append(make_movie(title, 1950 + index % 50, "/seen/{}".format(index)))
+        movies.append(make_movie(typo, 1950 + index % 50, "/watchlist/{}".format(index), TYPE_WATCHLIST))
+    groups, _, _ = find_duplicates(movies)
+    grouped = {tuple(sorted(movie.path for movie in group)) for group in groups}
+    missed = [pair for index, pair in enumerate(pairs)
+              if not any("/seen/{}".format(index) in group and "/watchlist/{}".format(index) in group
+                         for group in grouped)]
+    assert missed == []
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from movies_navigator.app import Cli
+from movies_navigator.movie import Movie, TYPE_SEEN, TYPE_WATCHLIST
+from movies_navigator.query import And, Or, Not, Predicate, Plan, Statistics, parse_query
+
+__author__ = "Ali Masri"
+__copyright__ = "Ali Masri"
+__license__ = "none"
+
+
+def make_movies():
+    movies = []
+    for index in range(20):
+        movie = Movie()
+        movie.id = index + 1
+        movie.title = "movie {}".format(index)
+        movie.year = 1990 + index
+        movie.rating = index / 2.0
+        movie.genres = ["comedy"] if index % 2 else ["drama", "comedy"]
+        movie.plot = "a heist in paris" if index < 2 else "a family story"
+        movie.type = TYPE_SEEN if index < 10 else TYPE_WATCHLIST
+        movie.path = "/movies/{}".format(index)
+        movie.size = index * 1024 ** 3
+        movies.append(movie)
+    return movies
+
+
+def describe(node):
+    return node.describe(Statistics([]))
+
+
+def test_not_binds_tighter_than_and_which_binds_tighter_than_or():
+    node = parse_query("type:seen OR genre:drama AND NOT year<2000")
+    assert isinstance(node, Or)
+    first, second = node.children
+    assert isinstance(first, Predicate)
+    assert isinstance(second, And)
+    assert isinstance(second.children[1], Not)
+
+
+def test_parentheses_and_implicit_and():
+    node = parse_query('(year>=2000 or rating>8) title:"movie 1" NOT type:seen')
+    assert isinstance(node, And)
+    assert [type(child) for child in node.children] == [Or, Predicate, Not]
+    assert node.children[1].value == "movie 1"
+
+
+@pytest.mark.parametrize("query, message", [
+    ("(genre:comedy", "missing closing parenthesis"),
+    ("genre:comedy)", "unexpected token: )"),
+    ("genre:comedy AND", "unexpected end of query"),
+    ("foo bar", "unexpected word: foo"),
+    ("colour:red", "unknown field: colour"),
+    ("year>>2000", "invalid year value: >2000"),
+    ("type:tv", "invalid type: tv"),
+    ("genre>comedy", "genre only supports :, = and !="),
+    ("title>abc", "title only supports : and ="),
+    ('title:""', "empty title value"),
+    ('plot:"  "', "empty plot value"),
+    ("year>=2000 @", "invalid query near: @"),
+])
+def test_parse_errors(query, message):
+    with pytest.raises(ValueError) as error:
+        parse_query(query)
+    assert str(error.value) == message
+
+
+def test_empty_query():
+    assert parse_query("  ") is None
+
+
+def test_selectivity_estimates_from_statistics():
+    statistics = Statistics(make_movies())
+    assert parse_query("type:seen").selectivity(statistics) == 0.5
+    assert parse_query("genre:drama").selectivity(statistics) == 0.5
+    assert parse_query("year>=2005").selectivity(statistics) == 0.25
+    assert parse_query("plot:paris").selectivity(statistics) == 0.1
+    assert parse_query("title:12").selectivity(statistics) == 0.05
+    assert parse_query("NOT genre:comedy").selectivity(statistics) == 0
+
+
+@pytest.mark.parametrize("query, ids", [
+    ("title:movie", list(range(1, 21))),
+    ("title:mov", []),
+    ("title:1", [2]),
+    ('title:"movie 12"', [13]),
+    ("plot:heist", [1, 2]),
+    ("plot:heis", []),
+])
+def test_text_predicates_match_whole_words_like_their_estimates(query, ids):
+    movies = make_movies()
+    statistics = Statistics(movies)
+    plan = Plan(parse_query(query), statistics)
+    assert [movie.id for movie in plan.execute(movies)] == ids
+    assert plan.stages[0].selectivity == len(ids) / len(movies)
+
+
+def test_planner_puts_cheap_selective_predicates_first():
+    movies = make_movies()
+    plan = Plan(parse_query("genre:comedy AND plot:heist AND year<2018 AND type:seen"), Statistics(movies))
+    assert [stage.description for stage in plan.stages] == ["type=seen", "plot=heist", "genre=comedy", "year<2018"]
+
+
+def test_planner_orders_all_stages_and_counts_rows():
+    movies = make_movies()
+    plan = Plan(parse_query("genre:comedy AND plot:heist AND type:seen"), Statistics(movies))
+    assert [stage.description for stage in plan.stages] == ["type=seen", "plot=heist", "genre=comedy"]
+    results = list(plan.execute(movies))
+    assert [movie.id for movie in results] == [1, 2]
+    assert [(stage.rows_in, stage.rows_out) for stage in plan.stages] == [(20, 10), (10, 2), (2, 2)]
+
+
+def test_limit_stops_pulling_rows_early():
+    movies = make_movies()
+    plan = Plan(parse_query("genre:comedy AND year>=1990"), Statistics(movies))
+    results = list(plan.execute(movies, limit=3))
+    assert [movie.id for movie in results] == [1, 2, 3]
+    assert plan.stages[0].rows_in == 3
+
+
+def test_or_orders_likely_branch_first():
+    statistics = Statistics(make_movies())
+    node = parse_query("year<1992 OR year>=1992")
+    assert describe(node) == "(year<1992 OR year>=1992)"
+    assert node.describe(statistics) == "(year>=1992 OR year<1992)"
+
+
+@pytest.fixture
+def cli(tmp_path):
+    return Cli(make_movies(), None, None, str(tmp_path / "movies.data"))
+
+
+def test_ls_flags_become_predicates(cli):
+    plan, movies = cli.query_movies("-t watchlist -g Drama --min-year 2002 --max-rating 8 --min-size 11G")
+    assert sorted(stage.description for stage in plan.stages) == sorted([
+        "type=watchlist", "genre=drama", "year>=2002", "rating<=8.0", "size>={}".format(11 * 1024 ** 3)])
+    assert [movie.id for movie in movies] == [13, 15, 17]
+
+
+def test_ls_query_and_flags_are_combined(cli):
+    _, movies = cli.query_movies("-q 'genre:drama AND (year<1992 OR rating>=9)' -t seen")
+    assert [movie.id for movie in movies] == [1]
+
+
+def test_ls_sort_with_limit(cli):
+    _, movies = cli.query_movies("-q 'NOT type:seen' --sort-by rating --limit 2")
+    assert [movie.id for movie in movies] == [11, 12]
+    _, movies = cli.query_movies("--sort-by size --limit 0")
+    assert movies == []
+
+
+def test_ls_rejects_negative_limit(cli):
+    with pytest.raises(SystemExit):
+        cli.query_movies("--limit -1")
+
+
+def test_explain_prints_stage_counts(cli, capsys):
+    cli.do_explain("-q 'type:seen AND genre:drama' --limit 2")
+    output = capsys.readouterr().out
+    assert "1. type=seen" in output
+    assert "rows 3 -> 3" in output
+    assert "2. genre=drama" in output
+    assert "rows 3 -> 2" in output
+    assert "2 movies returned" in output
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from movies_navigator.movie import Movie
+from movies_navigator.similar import update_neighbour_table, get_similar_movies
+
+__author__ = "Ali Masri"
+__copyright__ = "Ali Masri"
+__license__ = "none"
+
+PLOTS = ["a hacker discovers the simulated reality run by machines",
+         "machines hunt a hacker inside a simulated reality",
+         "a detective investigates a murder in a rainy city",
+         "a rookie detective and a veteran hunt a serial murder suspect",
+         "two friends drive across the country to a wedding",
+         "a family road trip across the country goes wrong"]
+GENRES = [["sci-fi", "action"], ["sci-fi", "action"], ["crime", "drama"], ["crime", "thriller"],
+          ["comedy"], ["comedy", "family"]]
+
+
+def make_movies():
+    movies = []
+    for index, (plot, genres) in enumerate(zip(PLOTS * 5, GENRES * 5)):
+        movie = Movie()
+        movie.id = index + 1
+        movie.path = "/movies/{}".format(index)
+        movie.title = "movie {}".format(index)
+        movie.year = 1980 + index
+        movie.plot = "{} number{}".format(plot, index)
+        movie.genres = genres
+        movies.append(movie)
+    return movies
+
+
+def test_similar_movies_share_plot_and_genres():
+    movies = make_movies()
+    table, updated = update_neighbour_table(movies, k=3)
+    assert updated
+    similar = get_similar_movies(movies, table, movies[0])
+    assert len(similar) == 3
+    assert all(movie.genres == ["sci-fi", "action"] for movie in similar)
+
+
+def test_unchanged_and_rating_only_changes_keep_table():
+    movies = make_movies()
+    table, _ = update_neighbour_table(movies, k=3)
+    movies[0].rating = 9.5
+    _, updated = update_neighbour_table(movies, table, k=3)
+    assert not updated
+
+
+def test_incremental_update_matches_full_build():
+    movies = make_movies()
+    table, _ = update_neighbour_table(movies, k=3)
+    movies[0].plot = "a detective hunts machines"
+    movies[2].genres = ["sci-fi"]
+    movies[4].path = "/watchlist/4"
+    movies = movies[:-2]
+    table, updated = update_neighbour_table(movies, table, k=3)
+    assert updated
+    full, _ = update_neighbour_table(movies, dict(table, signatures={}, neighbours={}), k=3)
+    assert table["neighbours"] == full["neighbours"]
+
+
+def test_size_drift_rebuilds_document_frequencies():
+    movies = make_movies()
+    table, _ = update_neighbour_table(movies, k=3)
+    table, _ = update_neighbour_table(movies[:10], table, k=3)
+    assert table["nb_documents"] == 10
+    assert set(table["neighbours"]) == {movie.path for movie in movies[:10]}
+
+
+def test_movies_of_large_buckets_get_full_rows():
+    movies = []
+    for index in range(120):
+        movie = Movie()
+        movie.path = "/movies/drama {}".format(index)
+        movie.year = 2000 + index % 10
+        movie.genres = ["drama"]
+        movie.plot = "a family drama about grief and a small town secret"
+        movies.append(movie)
+    table, _ = update_neighbour_table(movies, k=10)
+    assert all(len(row) == 10 for row in table["neighbours"].values())
+    movies[0].year = 2009
+    movies[60].plot = "a lonely lighthouse keeper"
+    table, _ = update_neighbour_table(movies[1:], table, k=10)
+    full, _ = update_neighbour_table(movies[1:], dict(table, signatures={}, neighbours={}), k=10)
+    assert table["neighbours"] == full["neighbours"]
+    assert all(len(row) == 10 for row in table["neighbours"].values())
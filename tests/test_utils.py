@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from movies_navigator.movie import TYPE_SEEN, TYPE_WATCHLIST
+from movies_navigator.utils import parse_size, get_folder_size, get_folder_sizes, load_movies
+
+__author__ = "Ali Masri"
+__copyright__ = "Ali Masri"
+__license__ = "none"
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("100", 100),
+    ("100b", 100),
+    ("2K", 2048),
+    ("700M", 700 * 1024 ** 2),
+    ("700MB", 700 * 1024 ** 2),
+    ("1.5g", int(1.5 * 1024 ** 3)),
+    ("1T", 1024 ** 4),
+])
+def test_parse_size(value, expected):
+    assert parse_size(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "big", "1X", "G", "inf", "-inf", "nan", "1e400", "-5G", "-1"])
+def test_parse_size_invalid(value):
+    with pytest.raises(ValueError):
+        parse_size(value)
+
+
+def make_movie_folder(root):
+    folder = root / "movie"
+    (folder / "sub").mkdir(parents=True)
+    (folder / "info.txt").write_bytes(b"x" * 71)
+    (folder / "sub" / "video.mkv").write_bytes(b"x" * 5000)
+    return folder
+
+
+def test_get_folder_size_counts_nested_files(tmp_path):
+    folder = make_movie_folder(tmp_path)
+    assert get_folder_size(str(folder)) == 5071
+
+
+def test_cached_folders_are_not_listed_again(tmp_path, monkeypatch):
+    folder = make_movie_folder(tmp_path)
+    cache = {}
+    assert get_folder_sizes([str(folder)], cache) == [5071]
+    assert set(cache) == {str(folder), str(folder / "sub")}
+
+    def fail(path):
+        raise AssertionError("listed " + path)
+
+    monkeypatch.setattr(os, "scandir", fail)
+    assert get_folder_sizes([str(folder)], cache) == [5071]
+
+
+def test_files_written_in_place_are_measured_again(tmp_path):
+    folder = make_movie_folder(tmp_path)
+    cache = {}
+    get_folder_sizes([str(folder)], cache)
+    sub_mtime = os.stat(str(folder / "sub")).st_mtime
+    with open(str(folder / "sub" / "video.mkv"), "ab") as video:
+        video.write(b"x" * 100 * 1024)
+    assert os.stat(str(folder / "sub")).st_mtime == sub_mtime
+    assert get_folder_sizes([str(folder)], cache) == [5071 + 100 * 1024]
+
+
+def test_new_files_and_removed_folders_update_the_cache(tmp_path):
+    folder = make_movie_folder(tmp_path)
+    cache = {}
+    get_folder_sizes([str(folder)], cache)
+    (folder / "sub" / "video.mkv").unlink()
+    (folder / "sub").rmdir()
+    (folder / "movie.avi").write_bytes(b"x" * 29)
+    os.utime(str(folder), (0, 0))
+    assert get_folder_sizes([str(folder)], cache) == [100]
+    assert set(cache) == {str(folder)}
+
+
+def make_library(root):
+    for folder, title in [("seen/heat", "Heat"), ("watchlist/alien", "Alien")]:
+        (root / folder).mkdir(parents=True)
+        (root / folder / "info.txt").write_text("Title: {}\nYear: 1979\nGenres: drama\n".format(title))
+    (root / "seen" / "no info").mkdir()
+    (root / "watchlist" / "no info").mkdir()
+    (root / "watchlist" / "stray.txt").write_text("not a movie")
+    return str(root / "seen"), str(root / "watchlist")
+
+
+def test_load_movies_skips_folders_without_info_file(tmp_path):
+    seen_path, watchlist_path = make_library(tmp_path)
+    movies = load_movies(seen_path, watchlist_path, {})
+    assert [(movie.id, movie.title, movie.type) for movie in movies] == [(1, "heat", TYPE_SEEN),
+                                                                         (2, "alien", TYPE_WATCHLIST)]
+    assert all(movie.size > 0 for movie in movies)